@@ -5,6 +5,12 @@ import os
 import itertools
 import random
 import math
+import asyncio
+import time
+import logging
+from aiohttp import web
+from contextlib import contextmanager
+import numpy as np
 from dotenv import load_dotenv
 from collections import defaultdict
 from wcwidth import wcswidth
@@ -20,6 +26,10 @@ if not TOKEN:
 RESULTS_CHANNEL_ID = 1397883760497917992  # Replace with your results channel ID
 REGISTRATION_CHANNEL_ID = 1397883682072563843  # Optional: channel for registration
 UPDATE_CHANNEL_ID = 1398407241031352401  # Dedicated channel for persistent update messages
+METRICS_PORT = os.getenv('METRICS_PORT')  # Optional: serve Prometheus metrics on 127.0.0.1:<port>
+LEAN_GATEWAY = os.getenv('LEAN_GATEWAY', '').lower() in ("1", "true", "yes")  # Optional: no member chunking/caching, for large guilds
+AUTO_SHARD = os.getenv('AUTO_SHARD', '').lower() in ("1", "true", "yes")  # Optional: use AutoShardedBot for multi-guild deployments
+LEAN_MAX_MESSAGES = 100  # Message cache size in lean mode (discord.py default is 1000)
 # *************************************
 
 REGISTRATION_FILE = "data/teams.json"
@@ -27,15 +37,121 @@ RESULTS_FILE = "data/results.json"
 TOURNAMENT_STATE_FILE = "data/tournament_state.json"
 UPDATE_MSGS_FILE = "data/update_msgs.json"
 
-intents = discord.Intents.default()
-intents.message_content = True
-intents.members = True
+DEFAULT_QUALIFY_FRACTION = 2/3  # Share of the group that reaches the knockout bracket
+PROJECTION_SIMULATIONS = 20000
+PROJECTION_BATCH_SIZE = 2000  # Simulations per array batch, bounds memory on large groups
+
+if LEAN_GATEWAY:
+    # Only text traffic is needed. The privileged members intent is left off so no member
+    # events are streamed for the whole guild; the Member converter in !register resolves
+    # mentioned players from ctx.message.mentions, whose payload carries their member data.
+    intents = discord.Intents(guilds=True, guild_messages=True, dm_messages=True, message_content=True)
+    bot_options = {
+        "chunk_guilds_at_startup": False,
+        "member_cache_flags": discord.MemberCacheFlags.none(),
+        "max_messages": LEAN_MAX_MESSAGES,
+    }
+else:
+    intents = discord.Intents.default()
+    intents.message_content = True
+    intents.members = True
+    bot_options = {}
 
-bot = commands.Bot(command_prefix="!", intents=intents)
+bot_class = commands.AutoShardedBot if AUTO_SHARD else commands.Bot
+bot = bot_class(command_prefix="!", intents=intents, **bot_options)
 
 score_line_re = re.compile(r"Red:\s*(\d+)\s*\|\s*Blue\s*(\d+)", re.IGNORECASE)
 clan_line_re = re.compile(r"Clan:\s*(.+)")
 
+# -- Performance metrics --
+
+HISTOGRAM_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+timings = {}  # op name -> {"buckets": [...], "count": int, "sum": float, "max": float}
+counters = defaultdict(int)
+
+def observe(op, seconds):
+    h = timings.get(op)
+    if h is None:
+        h = timings[op] = {"buckets": [0] * len(HISTOGRAM_BUCKETS), "count": 0, "sum": 0.0, "max": 0.0}
+    for i, bound in enumerate(HISTOGRAM_BUCKETS):
+        if seconds <= bound:
+            h["buckets"][i] += 1
+    h["count"] += 1
+    h["sum"] += seconds
+    h["max"] = max(h["max"], seconds)
+
+@contextmanager
+def timed(op):
+    """Record the duration of the wrapped block (or decorated function) under `op`."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(op, time.perf_counter() - start)
+
+# Format string discord.py's HTTP client logs once for every 429 response
+# (a global limit logs a second line for the same response, which is not counted)
+RATE_LIMIT_LOG_PREFIX = "We are being rate limited."
+
+def count_http_exception():
+    counters["swallowed_http_exceptions"] += 1
+
+class RateLimitCounter(logging.Handler):
+    # discord.py retries 429s internally and only reports them through its logger,
+    # so rate limits are counted here and nowhere else
+    def emit(self, record):
+        if isinstance(record.msg, str) and record.msg.startswith(RATE_LIMIT_LOG_PREFIX):
+            counters["rate_limit_hits"] += 1
+
+logging.getLogger("discord.http").addHandler(RateLimitCounter())
+
+def metrics_to_prometheus():
+    lines = [
+        "# HELP vanillecup_duration_seconds Time spent in instrumented bot operations.",
+        "# TYPE vanillecup_duration_seconds histogram",
+    ]
+    for op, h in sorted(timings.items()):
+        for bound, n in zip(HISTOGRAM_BUCKETS, h["buckets"]):
+            lines.append(f'vanillecup_duration_seconds_bucket{{op="{op}",le="{bound}"}} {n}')
+        lines.append(f'vanillecup_duration_seconds_bucket{{op="{op}",le="+Inf"}} {h["count"]}')
+        lines.append(f'vanillecup_duration_seconds_sum{{op="{op}"}} {h["sum"]:.6f}')
+        lines.append(f'vanillecup_duration_seconds_count{{op="{op}"}} {h["count"]}')
+    lines += [
+        "# HELP vanillecup_rate_limit_hits_total Discord API rate limit hits.",
+        "# TYPE vanillecup_rate_limit_hits_total counter",
+        f"vanillecup_rate_limit_hits_total {counters['rate_limit_hits']}",
+        "# HELP vanillecup_swallowed_http_exceptions_total Discord HTTPExceptions caught and ignored.",
+        "# TYPE vanillecup_swallowed_http_exceptions_total counter",
+        f"vanillecup_swallowed_http_exceptions_total {counters['swallowed_http_exceptions']}",
+    ]
+    return "\n".join(lines) + "\n"
+
+def build_perf_text():
+    lines = [f"{'Operation':<28} | {'Count':>6} | {'Avg ms':>8} | {'Max ms':>8}"]
+    lines.append(f"{'-'*28} | {'-'*6} | {'-'*8} | {'-'*8}")
+    for op, h in sorted(timings.items()):
+        avg_ms = h["sum"] / h["count"] * 1000
+        lines.append(f"{op:<28} | {h['count']:>6} | {avg_ms:>8.2f} | {h['max'] * 1000:>8.2f}")
+    if not timings:
+        lines.append("No timings recorded yet.")
+    lines.append("")
+    lines.append(f"Rate limit hits: {counters['rate_limit_hits']}")
+    lines.append(f"Swallowed HTTP exceptions: {counters['swallowed_http_exceptions']}")
+    return "\n".join(lines)
+
+async def start_metrics_server(port):
+    async def handle_metrics(request):
+        return web.Response(text=metrics_to_prometheus(), content_type="text/plain", charset="utf-8")
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle_metrics)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+    print(f"Metrics endpoint listening on http://127.0.0.1:{port}/metrics")
+
+@timed("update_knockout_bracket")
 def update_knockout_bracket_with_results(bracket, results):
     def norm(t):
         return t.strip().lower().replace("_", "\\") if t else None
@@ -123,6 +239,7 @@ def load_teams():
     except FileNotFoundError:
         return {}
 
+@timed("save_teams")
 def save_teams(data):
     to_save = {info["display_name"]: {"captain": info["captain"], "members": info["members"]} for info in data.values()}
     with open(REGISTRATION_FILE, "w") as f:
@@ -135,6 +252,7 @@ def load_results():
     except FileNotFoundError:
         return []
 
+@timed("save_results")
 def save_results(data):
     with open(RESULTS_FILE, "w") as f:
         json.dump(data, f, indent=2)
@@ -146,6 +264,7 @@ def load_tournament_state():
     except FileNotFoundError:
         return {"phase": "registration", "groups": {}, "knockout_results": [], "qualifiers": []}
 
+@timed("save_tournament_state")
 def save_tournament_state(state):
     with open(TOURNAMENT_STATE_FILE, "w") as f:
         json.dump(state, f, indent=2)
@@ -157,6 +276,7 @@ def load_update_messages():
     else:
         return {}
 
+@timed("save_update_messages")
 def save_update_messages(data):
     with open(UPDATE_MSGS_FILE, "w") as f:
         json.dump(data, f, indent=2)
@@ -167,15 +287,20 @@ tournament_state = load_tournament_state()
 
 # -- Discord message helpers --
 
+async def timed_send(destination, content):
+    with timed("discord_send"):
+        return await destination.send(content)
+
 async def fetch_or_create_msg(channel, msg_key):
     data = load_update_messages()
     msg_id = data.get(msg_key)
     if msg_id:
         try:
-            msg = await channel.fetch_message(msg_id)
+            with timed("discord_fetch_message"):
+                msg = await channel.fetch_message(msg_id)
             return msg
         except discord.NotFound:
-            pass
+            count_http_exception()
 
     if msg_key == "teams_msg_id":
         content = "**Registered Teams:**\n_No teams registered yet._"
@@ -184,7 +309,7 @@ async def fetch_or_create_msg(channel, msg_key):
     else:
         content = "_Empty message_"
 
-    msg = await channel.send(content)
+    msg = await timed_send(channel, content)
     data[msg_key] = msg.id
     save_update_messages(data)
     return msg
@@ -205,9 +330,10 @@ async def update_teams_message():
             lines.append(f"- **{info['display_name']}**: {members}")
         content = "\n".join(lines)
     try:
-        await msg.edit(content=content)
+        with timed("discord_edit"):
+            await msg.edit(content=content)
     except discord.HTTPException:
-        pass
+        count_http_exception()
 
 # -- Tournament helpers --
 
@@ -237,10 +363,12 @@ async def update_results_message(standings_text="", schedule_text="", bracket_te
         content += f"{bracket_text}\n"
 
     try:
-        await msg.edit(content=content)
+        with timed("discord_edit"):
+            await msg.edit(content=content)
     except discord.HTTPException:
-        pass
+        count_http_exception()
 
+@timed("calculate_group_standings")
 def calculate_group_standings(matches, teams_list):
     standings = {t: {"played":0,"wins":0,"draws":0,"losses":0,"points":0,"score_diff":0} for t in teams_list}
     for m in matches:
@@ -309,6 +437,122 @@ def build_group_schedule_text(matches):
             lines.append(f"{idx}. {t1} vs {t2}")
     return "\n".join(lines)
 
+# -- Projections --
+
+projections_cache = {"key": None, "future": None}  # future resolves to the projections text
+
+def simulate_group_projections(matches, teams_list, num_qualify, simulations=PROJECTION_SIMULATIONS, seed=None):
+    """
+    Monte Carlo simulation of the unplayed group matches.
+    Unplayed score margins are drawn from the margins already played (with a random sign),
+    every simulated table is ranked by (points, score_diff) like the standings, and ties keep
+    the group order, as the stable sort in startknockout does.
+    Returns {team: {"qualify": probability, "seed": most likely knockout seed or None, "seed_prob": probability}}.
+    """
+    rng = np.random.default_rng(seed)
+    n_teams = len(teams_list)
+    index = {t: i for i, t in enumerate(teams_list)}
+
+    # Unwrapped: this runs in a worker thread and must not touch the hot-path timings
+    base = calculate_group_standings.__wrapped__(matches, teams_list)
+    base_points = np.array([base[t]["points"] for t in teams_list], dtype=np.int64)
+    base_diff = np.array([base[t]["score_diff"] for t in teams_list], dtype=np.int64)
+
+    played = [m for m in matches if m["result"] is not None]
+    unplayed = [m for m in matches if m["result"] is None]
+    margin_pool = np.array([abs(m["result"]["red_score"] - m["result"]["blue_score"]) for m in played] or [1], dtype=np.int64)
+
+    # Every simulated match draws one index into these outcome tables (margin from team1's side)
+    signed_margins = np.concatenate([margin_pool, -margin_pool])
+    home_points_table = np.where(signed_margins > 0, 3, np.where(signed_margins == 0, 1, 0)).astype(np.float32)
+    away_points_table = np.where(signed_margins < 0, 3, np.where(signed_margins == 0, 1, 0)).astype(np.float32)
+    margin_table = signed_margins.astype(np.float32)
+
+    # Incidence matrices: row per unplayed match, +1 in the column of team1 (home) / team2 (away).
+    # float32 so the per-batch sums go through BLAS matmul; the values stay exact integers.
+    home = np.zeros((len(unplayed), n_teams), dtype=np.float32)
+    away = np.zeros((len(unplayed), n_teams), dtype=np.float32)
+    for row, m in enumerate(unplayed):
+        home[row, index[m["team1"]]] = 1
+        away[row, index[m["team2"]]] = 1
+    home_minus_away = home - away
+
+    # Upper bound on |score_diff| so (points, score_diff) packs into one sortable integer
+    diff_bound = int(np.abs(base_diff).max(initial=0) + margin_pool.max() * len(unplayed)) + 1
+    positions = np.arange(n_teams)
+
+    qualify_counts = np.zeros(n_teams, dtype=np.int64)
+    seed_counts = np.zeros((n_teams, max(num_qualify, 1)), dtype=np.int64)
+
+    done = 0
+    while done < simulations:
+        batch = min(PROJECTION_BATCH_SIZE, simulations - done)
+        outcomes = rng.integers(0, len(signed_margins), size=(batch, len(unplayed)))
+        points = base_points + (home_points_table[outcomes] @ home + away_points_table[outcomes] @ away).astype(np.int64)
+        diff = base_diff + (margin_table[outcomes] @ home_minus_away).astype(np.int64)
+
+        key = points * (2 * diff_bound + 1) + (diff + diff_bound)
+        order = np.argsort(-key, axis=1, kind="stable")
+        ranks = np.empty_like(order)
+        np.put_along_axis(ranks, order, np.broadcast_to(positions, order.shape), axis=1)
+
+        qualified = ranks < num_qualify
+        qualify_counts += qualified.sum(axis=0)
+        qualified_teams = np.broadcast_to(positions, ranks.shape)[qualified]
+        flat = qualified_teams * seed_counts.shape[1] + ranks[qualified]
+        seed_counts += np.bincount(flat, minlength=seed_counts.size).reshape(seed_counts.shape)
+        done += batch
+
+    projections = {}
+    for t, i in index.items():
+        if qualify_counts[i]:
+            likely = int(seed_counts[i].argmax())
+            projections[t] = {
+                "qualify": float(qualify_counts[i] / simulations),
+                "seed": likely + 1,
+                "seed_prob": float(seed_counts[i, likely] / simulations),
+            }
+        else:
+            projections[t] = {"qualify": 0.0, "seed": None, "seed_prob": 0.0}
+    return projections
+
+def build_projections_text(matches, teams_list):
+    standings = calculate_group_standings.__wrapped__(matches, teams_list)
+    sorted_teams = sorted(standings.items(), key=lambda t: (t[1]["points"], t[1]["score_diff"]), reverse=True)
+    num_qualify = max(1, math.floor(DEFAULT_QUALIFY_FRACTION * len(teams_list)))
+    remaining = sum(1 for m in matches if m["result"] is None)
+
+    projections = simulate_group_projections(matches, teams_list, num_qualify)
+
+    max_team_width = max(wcswidth(teams[t]["display_name"]) for t in teams_list)
+    col_width = max(12, max_team_width)
+
+    lines = [f"{PROJECTION_SIMULATIONS} simulations of {remaining} remaining matches, top {num_qualify} qualify"]
+    lines.append(f"Pos | Team{' '*(col_width - 4)} | Pts | Qualify | Likely seed")
+    lines.append(f"--- | {'-'*col_width} | --- | ------- | -----------")
+    for idx, (norm_team, s) in enumerate(sorted_teams, 1):
+        p = projections[norm_team]
+        padded_team = pad_to_width(teams[norm_team]["display_name"], col_width)
+        seed_text = f"#{p['seed']} ({p['seed_prob']:.0%})" if p["seed"] else "-"
+        lines.append(f"{idx:3} | {padded_team} | {s['points']:3} | {p['qualify']:7.1%} | {seed_text}")
+    return "\n".join(lines)
+
+def split_code_blocks(text, limit=1990):
+    """Split text on line boundaries into ```-wrapped chunks that fit in a Discord message."""
+    chunks = []
+    current = []
+    size = 0
+    for line in text.split("\n"):
+        if current and size + len(line) + 1 > limit - 6:
+            chunks.append("```" + "\n".join(current) + "```")
+            current = []
+            size = 0
+        current.append(line)
+        size += len(line) + 1
+    if current:
+        chunks.append("```" + "\n".join(current) + "```")
+    return chunks
+
 # -- Scheduling --
 
 def generate_partial_schedule(team_list, rounds):
@@ -402,30 +646,43 @@ def bracket_to_string(rounds, results):
 
 # -- Commands --
 
+@bot.event
+async def setup_hook():
+    if METRICS_PORT:
+        try:
+            await start_metrics_server(int(METRICS_PORT))
+        except (ValueError, OSError) as e:
+            print(f"Metrics endpoint disabled, could not serve on port {METRICS_PORT!r}: {e}")
+
+@bot.command()
+@commands.has_permissions(administrator=True)
+async def perf(ctx):
+    await timed_send(ctx, f"```{build_perf_text()}```")
+
 @bot.command()
 @commands.has_permissions(administrator=True)
 async def reloadteams(ctx):
     global teams
     teams = load_teams()
-    await ctx.send("Teams reloaded from file.")
+    await timed_send(ctx, "Teams reloaded from file.")
     await update_teams_message()
 
 @bot.command(name="register")
 async def register(ctx, team_name: str, *members: discord.Member):
     global teams
     if ctx.channel.id == RESULTS_CHANNEL_ID:
-        await ctx.send("Please use the dedicated registration channel to register teams.")
+        await timed_send(ctx, "Please use the dedicated registration channel to register teams.")
         return
 
     teams = load_teams()
 
     norm_name = normalize_name(team_name)
     if norm_name in teams:
-        await ctx.send(f"Team **{team_name}** is already registered.")
+        await timed_send(ctx, f"Team **{team_name}** is already registered.")
         return
 
     if not members:
-        await ctx.send("Please mention at least one team member (including captain).")
+        await timed_send(ctx, "Please mention at least one team member (including captain).")
         return
 
     captain = members[0]
@@ -438,7 +695,7 @@ async def register(ctx, team_name: str, *members: discord.Member):
     }
 
     save_teams(teams)
-    await ctx.send(f"Team **{team_name}** registered!\nCaptain: {captain.mention}\nMembers: {', '.join(m.mention for m in member_list)}")
+    await timed_send(ctx, f"Team **{team_name}** registered!\nCaptain: {captain.mention}\nMembers: {', '.join(m.mention for m in member_list)}")
 
     await update_teams_message()
 
@@ -447,15 +704,15 @@ async def register(ctx, team_name: str, *members: discord.Member):
 async def startgroups(ctx, rounds: int = 1):
     global tournament_state
     if tournament_state.get("phase") != "registration":
-        await ctx.send("Groups already started or tournament not in registration phase.")
+        await timed_send(ctx, "Groups already started or tournament not in registration phase.")
         return
 
     if len(teams) < 2:
-        await ctx.send("Not enough teams registered to start the group stage.")
+        await timed_send(ctx, "Not enough teams registered to start the group stage.")
         return
 
     if rounds < 1:
-        await ctx.send("Number of rounds must be at least 1.")
+        await timed_send(ctx, "Number of rounds must be at least 1.")
         return
 
     team_list = list(teams.keys())
@@ -475,36 +732,71 @@ async def startgroups(ctx, rounds: int = 1):
     }
     save_tournament_state(tournament_state)
 
-    await ctx.send(f"Group stage started with {len(team_list)} teams in GroupA, {rounds} rounds per team. Matches scheduled.")
+    await timed_send(ctx, f"Group stage started with {len(team_list)} teams in GroupA, {rounds} rounds per team. Matches scheduled.")
     standings_text, schedule_text = await update_group_standings_and_schedule()
     await update_results_message(standings_text=standings_text, schedule_text=schedule_text)
 
 @bot.command()
 async def standings(ctx):
     if tournament_state.get("phase") != "group":
-        await ctx.send("Group standings are only available during the group phase.")
+        await timed_send(ctx, "Group standings are only available during the group phase.")
         return
 
     group = tournament_state["groups"].get("GroupA")
     if not group:
-        await ctx.send("No group data found.")
+        await timed_send(ctx, "No group data found.")
         return
 
     standings = calculate_group_standings(group["matches"], group["teams"])
     text = build_standings_text(standings)
-    await ctx.send(f"```{text}```")
+    await timed_send(ctx, f"```{text}```")
+
+@bot.command()
+async def projections(ctx):
+    if tournament_state.get("phase") != "group":
+        await timed_send(ctx, "Projections are only available during the group phase.")
+        return
+
+    group = tournament_state["groups"].get("GroupA")
+    if not group:
+        await timed_send(ctx, "No group data found.")
+        return
+
+    # Reuse the last simulation until a new result changes the group
+    key = (tuple(group["teams"]), tuple(
+        (m["team1"], m["team2"], m["result"]["red_score"], m["result"]["blue_score"]) if m["result"] else None
+        for m in group["matches"]
+    ))
+    if projections_cache["key"] != key:
+        # Shallow copies: on_message replaces match["result"] while the worker thread reads
+        matches = [dict(m) for m in group["matches"]]
+        future = asyncio.get_running_loop().run_in_executor(None, build_projections_text, matches, list(group["teams"]))
+        projections_cache.update(key=key, future=future)
+        try:
+            with timed("simulate_projections"):
+                text = await asyncio.shield(future)
+        except Exception:
+            if projections_cache["future"] is future:
+                projections_cache.update(key=None, future=None)
+            raise
+    else:
+        # A simulation for these results is finished or still running; share it
+        text = await asyncio.shield(projections_cache["future"])
+
+    for chunk in split_code_blocks(text):
+        await timed_send(ctx, chunk)
 
 @bot.command()
 @commands.has_permissions(administrator=True)
 async def startknockout(ctx, qualify_count: str = "2/3"):
     global tournament_state
     if tournament_state.get("phase") != "group":
-        await ctx.send("Knockout phase can only be started after the group phase.")
+        await timed_send(ctx, "Knockout phase can only be started after the group phase.")
         return
 
     group = tournament_state["groups"].get("GroupA")
     if not group:
-        await ctx.send("No group data found.")
+        await timed_send(ctx, "No group data found.")
         return
 
     standings = calculate_group_standings(group["matches"], group["teams"])
@@ -524,11 +816,11 @@ async def startknockout(ctx, qualify_count: str = "2/3"):
         else:
             num_qualify = int(qualify_count)
     except Exception:
-        await ctx.send("Invalid qualifier count. Enter integer, fraction like '2/3', or decimal like '0.5'.")
+        await timed_send(ctx, "Invalid qualifier count. Enter integer, fraction like '2/3', or decimal like '0.5'.")
         return
     
     if num_qualify < 1:
-        await ctx.send("Must qualify at least one team.")
+        await timed_send(ctx, "Must qualify at least one team.")
         return
 
     if num_qualify > total_teams:
@@ -541,7 +833,7 @@ async def startknockout(ctx, qualify_count: str = "2/3"):
     tournament_state["knockout_results"] = []
     save_tournament_state(tournament_state)
 
-    await ctx.send(f"Group stage ended! Qualifiers for knockout phase: {', '.join(teams[t]['display_name'] for t in qualifiers)}")
+    await timed_send(ctx, f"Group stage ended! Qualifiers for knockout phase: {', '.join(teams[t]['display_name'] for t in qualifiers)}")
 
     standings_text = build_standings_text(standings)
     schedule_text = build_group_schedule_text(group["matches"])
@@ -566,46 +858,47 @@ async def on_message(message):
     if message.author == bot.user:
         return
 
-    lines = message.content.splitlines()
+    with timed("parse_result"):
+        lines = message.content.splitlines()
 
-    red_index = find_line_containing(lines, "Red Team:")
-    blue_index = find_line_containing(lines, "Blue Team:")
+        red_index = find_line_containing(lines, "Red Team:")
+        blue_index = find_line_containing(lines, "Blue Team:")
 
-    if red_index == -1 or blue_index == -1:
-        return
+        if red_index == -1 or blue_index == -1:
+            return
 
-    try:
-        red_clan_line = lines[red_index + 1].strip().strip("*")
-        blue_clan_line = lines[blue_index + 1].strip().strip("*")
+        try:
+            red_clan_line = lines[red_index + 1].strip().strip("*")
+            blue_clan_line = lines[blue_index + 1].strip().strip("*")
 
-        red_clan_match = clan_line_re.match(red_clan_line)
-        blue_clan_match = clan_line_re.match(blue_clan_line)
+            red_clan_match = clan_line_re.match(red_clan_line)
+            blue_clan_match = clan_line_re.match(blue_clan_line)
 
-        if not red_clan_match or not blue_clan_match:
-            return
+            if not red_clan_match or not blue_clan_match:
+                return
 
-        red_clan = red_clan_match.group(1).strip().strip("*")
-        blue_clan = blue_clan_match.group(1).strip().strip("*")
+            red_clan = red_clan_match.group(1).strip().strip("*")
+            blue_clan = blue_clan_match.group(1).strip().strip("*")
 
-        score_line = None
-        for line in reversed(lines):
-            plain = line.strip().strip("*")
-            if plain.lower().startswith("red:") and "blue" in plain.lower():
-                score_line = plain
-                break
+            score_line = None
+            for line in reversed(lines):
+                plain = line.strip().strip("*")
+                if plain.lower().startswith("red:") and "blue" in plain.lower():
+                    score_line = plain
+                    break
 
-        if not score_line:
-            return
+            if not score_line:
+                return
 
-        score_match = score_line_re.match(score_line)
-        if not score_match:
-            return
+            score_match = score_line_re.match(score_line)
+            if not score_match:
+                return
 
-        red_score = int(score_match.group(1))
-        blue_score = int(score_match.group(2))
+            red_score = int(score_match.group(1))
+            blue_score = int(score_match.group(2))
 
-    except Exception:
-        return
+        except Exception:
+            return
 
     red_clan_norm = normalize_name(red_clan)
     blue_clan_norm = normalize_name(blue_clan)
@@ -645,7 +938,7 @@ async def on_message(message):
                 break
 
         if not updated:
-            await message.channel.send(f"Match result does not match scheduled group stage matches: {red_clan} vs {blue_clan}")
+            await timed_send(message.channel, f"Match result does not match scheduled group stage matches: {red_clan} vs {blue_clan}")
             return
 
         save_tournament_state(tournament_state)
@@ -658,7 +951,7 @@ async def on_message(message):
             standings = calculate_group_standings(group["matches"], group["teams"])
             sorted_teams = sorted(standings.items(), key=lambda t: (t[1]["points"], t[1]["score_diff"]), reverse=True)
 
-            fraction = 2/3  # Default qualifying fraction
+            fraction = DEFAULT_QUALIFY_FRACTION
             num_qualify = math.floor(fraction * len(sorted_teams))
             if num_qualify < 1:
                 num_qualify = 1
@@ -672,7 +965,7 @@ async def on_message(message):
 
             channel = bot.get_channel(UPDATE_CHANNEL_ID)
             if channel:
-                await channel.send(f"Group stage completed! Qualifiers: {', '.join(qualifiers)}")
+                await timed_send(channel, f"Group stage completed! Qualifiers: {', '.join(qualifiers)}")
 
             standings_text = build_standings_text(standings)
             schedule_text = build_group_schedule_text(group["matches"])